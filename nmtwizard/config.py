@@ -18,6 +18,20 @@ def merge_config(a, b):
                 a[key] = b_value
     return a
 
+def merged_config(a, b):
+    """Returns config b merged in a, without modifying a.
+
+    Only the dicts updated by b are copied, other values are shared with a.
+    """
+    merged = dict(a)
+    for key, b_value in six.iteritems(b):
+        a_value = merged.get(key)
+        if isinstance(b_value, dict) and a_value is not None and isinstance(a_value, dict):
+            merged[key] = merged_config(a_value, b_value)
+        else:
+            merged[key] = b_value
+    return merged
+
 def replace_config(a, b):
     """Updates fields in a by fields in b."""
     a.update(b)
@@ -171,6 +185,32 @@ def read_options(config, options):
         return operators_options
     return config_override
 
+def _is_positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+# Options of the "data" section that control how the preprocessing is run, with
+# their default value, a validation function, and a description of the expected value.
+_DATA_OPTIONS = {
+    # Collect the execution time of each operator when preprocessing training data.
+    "profile_operators": (True, lambda value: isinstance(value, bool), "a boolean"),
+    # Number of consecutive batches with the same corpus label that are sent at once
+    # to a worker process.
+    "fetch_factor": (1, _is_positive_int, "an integer >= 1"),
+}
+
+def get_data_option(config, name):
+    """Returns the value of a preprocessing option from the "data" section.
+
+    Raises:
+      ValueError: if the value is not valid.
+    """
+    default, is_valid, expected = _DATA_OPTIONS[name]
+    value = config.get('data', {}).get(name, default)
+    if not is_valid(value):
+        raise ValueError('Invalid value for "data/%s": expected %s, but got %r'
+                         % (name, expected, value))
+    return value
+
 def is_v2_config(config):
     """Returns True if config is a V2 configuration."""
     preprocess = config.get("preprocess")
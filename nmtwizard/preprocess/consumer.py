@@ -1,8 +1,8 @@
 # coding: utf-8
-import six
 import abc
 import os
 import collections
+import concurrent.futures
 import itertools
 
 import pyonmttok
@@ -12,8 +12,7 @@ from nmtwizard.preprocess import tokenizer
 
 logger = get_logger(__name__)
 
-@six.add_metaclass(abc.ABCMeta)
-class Consumer(object):
+class Consumer(abc.ABC):
     """Base class for using preprocess results."""
 
     def __init__(self):
@@ -229,6 +228,7 @@ class SubwordLearner(Consumer):
         tok_config = config['preprocess'][self._tok_step]
 
         # Learn subword models and write them to files.
+        learn_jobs = []
         for side, subword_info in all_subword_info:
             name =  tok_config[side]['build_subword']['name'] \
                     if 'name' in tok_config[side]['build_subword'] \
@@ -249,7 +249,21 @@ class SubwordLearner(Consumer):
                                         "%s_%s-%d.%s" % (subword_type, name, size, config[side]))
                 tok_config[side][subword_type+"_model_path"] = out_file
 
-            subword_info['learner'].learn(out_file)
+            learn_jobs.append((subword_info['learner'], out_file, subword_type))
+
+        # Source and target BPE models are independent and the BPE learner releases
+        # the GIL, so they are learned in parallel. Other learners are not known to be
+        # safe to run concurrently.
+        if len(learn_jobs) == 1 or any(job[2] != 'bpe' for job in learn_jobs):
+            for learner, out_file, _ in learn_jobs:
+                learner.learn(out_file)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(learn_jobs)) as executor:
+                futures = [
+                    executor.submit(learner.learn, out_file)
+                    for learner, out_file, _ in learn_jobs]
+                for future in futures:
+                    future.result()
 
 
 class VocabularyBuilder(Consumer):
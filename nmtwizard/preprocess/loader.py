@@ -1,12 +1,10 @@
 # coding: utf-8
-import six
 import abc
 
 from nmtwizard import utils
 from nmtwizard.preprocess import tu
 
-@six.add_metaclass(abc.ABCMeta)
-class Loader(object):
+class Loader(abc.ABC):
     """Base class for creating batches of TUs."""
 
     def __init__(self, batch_size):
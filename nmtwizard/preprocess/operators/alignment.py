@@ -39,6 +39,31 @@ class Aligner(prepoperator.Operator):
         tu_list, meta_batch = tu_batch
         if self.process_type == prepoperator.ProcessType.TRAINING:
             meta_batch['write_alignment'] = self._write_alignment
-        for tu in tu_list :
-            tu.set_alignment(self._aligner)
+        if not hasattr(self._aligner, 'align_batch'):
+            for tu in tu_list :
+                tu.set_alignment(self._aligner)
+            return tu_list, meta_batch
+
+        # Align all parts of the batch in a single call: the aligner is usually a proxy
+        # to an instance shared across workers, so each call is a round trip to the
+        # manager process.
+        src_parts = []
+        tgt_parts = []
+        num_parts = []
+        for tu in tu_list:
+            src_tok = tu.src_tok
+            tgt_tok = tu.tgt_tok
+            if src_tok.tokenizer is None or tgt_tok.tokenizer is None:
+                raise RuntimeError('Cannot set alignment if not tokenization is set.')
+            src_tokens = src_tok.tokens
+            tgt_tokens = tgt_tok.tokens
+            num_parts.append(min(len(src_tokens), len(tgt_tokens)))
+            src_parts.extend(src_tokens[:num_parts[-1]])
+            tgt_parts.extend(tgt_tokens[:num_parts[-1]])
+
+        align_results = self._aligner.align_batch(src_parts, tgt_parts) if src_parts else []
+        offset = 0
+        for tu, tu_num_parts in zip(tu_list, num_parts):
+            tu.set_align_results(align_results[offset:offset + tu_num_parts])
+            offset += tu_num_parts
         return tu_list, meta_batch
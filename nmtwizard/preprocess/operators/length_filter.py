@@ -7,49 +7,65 @@ class LengthFilter(prepoperator.Filter):
         source_config = _get_side_config(config, 'source')
         target_config = _get_side_config(config, 'target')
 
-        filters = []
-        filters.extend(_get_side_filters(
-            source_config,
-            lambda tu: tu.src_detok,
-            lambda tu: tu.src_tok.tokens[0]))
-        filters.extend(_get_side_filters(
-            target_config,
-            lambda tu: tu.tgt_detok,
-            lambda tu: tu.tgt_tok.tokens[0]))
-
+        src_max_chars, src_max_words, src_min_words = _get_side_limits(source_config)
+        tgt_max_chars, tgt_max_words, tgt_min_words = _get_side_limits(target_config)
+        src_check_words = src_max_words is not None or src_min_words is not None
+        tgt_check_words = tgt_max_words is not None or tgt_min_words is not None
 
         min_words_ratio = config.get('min_words_ratio')
-        if min_words_ratio is not None:
-            filters.append(lambda tu: (
-                len(tu.src_tok.tokens[0]) / len(tu.tgt_tok.tokens[0]) < min_words_ratio))
-
         max_words_ratio = config.get('max_words_ratio')
-        if max_words_ratio is not None:
-            filters.append(lambda tu: (
-                len(tu.src_tok.tokens[0]) / len(tu.tgt_tok.tokens[0]) > max_words_ratio))
+        check_ratio = min_words_ratio is not None or max_words_ratio is not None
 
-        super(LengthFilter, self).__init__(filters)
+        # All criteria are evaluated in a single function so that each length is
+        # computed at most once per TU. Criteria are checked in the same order as
+        # separate filters would be.
+        def _filter(tu):
+            src_words = None
+            tgt_words = None
 
+            if src_max_chars is not None and len(tu.src_detok) > src_max_chars:
+                return True
+            if src_check_words:
+                src_words = len(tu.src_tok.tokens[0])
+                if src_max_words is not None and src_words > src_max_words:
+                    return True
+                if src_min_words is not None and src_words < src_min_words:
+                    return True
 
-def _get_side_config(config, side):
-    config = config.get(side, {})
-    # Filter empty sentences by default.
-    config.setdefault('min_words', 1)
-    return config
+            if tgt_max_chars is not None and len(tu.tgt_detok) > tgt_max_chars:
+                return True
+            if tgt_check_words:
+                tgt_words = len(tu.tgt_tok.tokens[0])
+                if tgt_max_words is not None and tgt_words > tgt_max_words:
+                    return True
+                if tgt_min_words is not None and tgt_words < tgt_min_words:
+                    return True
 
-def _get_side_filters(config, chars_fn, words_fn):
-    filters = []
+            if check_ratio:
+                if src_words is None:
+                    src_words = len(tu.src_tok.tokens[0])
+                if tgt_words is None:
+                    tgt_words = len(tu.tgt_tok.tokens[0])
+                ratio = src_words / tgt_words
+                if min_words_ratio is not None and ratio < min_words_ratio:
+                    return True
+                if max_words_ratio is not None and ratio > max_words_ratio:
+                    return True
 
-    max_chars = config.get('max_characters')
-    if max_chars is not None:
-        filters.append(lambda tu: len(chars_fn(tu)) > max_chars)
+            return False
 
-    max_words = config.get('max_words')
-    if max_words is not None:
-        filters.append(lambda tu: len(words_fn(tu)) > max_words)
+        super(LengthFilter, self).__init__([_filter])
 
-    min_words = config.get('min_words')
-    if min_words is not None:
-        filters.append(lambda tu: len(words_fn(tu)) < min_words)
 
-    return filters
+def _get_side_config(config, side):
+    config = dict(config.get(side, {}))
+    # Filter empty sentences by default.
+    config.setdefault('min_words', 1)
+    return config
+
+def _get_side_limits(config):
+    return (
+        config.get('max_characters'),
+        config.get('max_words'),
+        config.get('min_words'),
+    )
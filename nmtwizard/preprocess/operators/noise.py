@@ -6,6 +6,8 @@ from nmtwizard.preprocess.tu import TokReplace
 @prepoperator.register_operator("noise")
 class Noise(prepoperator.TUOperator):
 
+    _one_to_one = True
+
     @staticmethod
     def is_applied_for(process_type):
         return process_type == prepoperator.ProcessType.TRAINING
@@ -25,7 +27,7 @@ class Noise(prepoperator.TUOperator):
         tokens = src_tok.token_objects
         new_tokens = [self._apply_word_noise(tokens[0])]
         tu.src_tok = (src_tok.tokenizer, new_tokens)
-        return [tu]
+        return tu
 
     def _apply_word_noise(self, tokens):
         new_tokens = []
@@ -6,6 +6,8 @@ from nmtwizard.preprocess import tokenizer
 @prepoperator.register_operator("tokenization")
 class Tokenizer(prepoperator.MonolingualOperator):
 
+    _one_to_one = True
+
     @property
     def _detok(self):
         return False
@@ -1,13 +1,13 @@
 # coding: utf-8
-import six
 import abc
 import copy
 import collections
+import marshal
+import threading
 import time
-from itertools import chain
 
 from nmtwizard.logger import get_logger
-from nmtwizard.config import merge_config
+from nmtwizard.config import get_data_option, merge_config
 
 logger = get_logger(__name__)
 
@@ -37,12 +37,16 @@ def operator_info_generator(config,
                             override_label=None,
                             preprocess_exit_step=None,
                             ignore_disabled=True):
+    registry = _OPERATORS_REGISTRY
     for i, operator_config in enumerate(config):
         if preprocess_exit_step is not None and i > preprocess_exit_step:
             return
         # Get operator class and config.
-        operator_type = get_operator_type(operator_config)
-        operator_cls = get_operator_class(operator_type)
+        operator_type = operator_config.get("op")
+        operator_cls = registry.get(operator_type)
+        if operator_cls is None:
+            # Raise the appropriate error for a missing or unknown operator type.
+            get_operator_class(get_operator_type(operator_config))
         if not operator_cls.is_applied_for(process_type):
             continue
         operator_params = get_operator_params(operator_config, operator_type, override_label=override_label)
@@ -64,11 +68,60 @@ def get_operator_class(op):
         raise ValueError("Unknown operator '%s'" % op)
     return operator_cls
 
+# Operator parameters resolved from the configuration, keyed by the identity of
+# the operator configuration and the override label. Each entry also references the
+# configuration so that its id can not be reused by another object. Entries are not
+# updated when a configuration is modified in place: clear_operator_params_cache
+# should then be called.
+_operator_params_cache = collections.OrderedDict()
+_operator_params_cache_lock = threading.Lock()
+_OPERATOR_PARAMS_CACHE_SIZE = 256
+
+def clear_operator_params_cache():
+    """Clears the operator parameters resolved by get_operator_params."""
+    with _operator_params_cache_lock:
+        _operator_params_cache.clear()
+
 def get_operator_params(config, operator_type, override_label=None):
-    """Returns the operator parameters from the configuration."""
-    config = copy.deepcopy(config)
-    config.pop("op", None)
-    override_config = config.pop("overrides", None)
+    """Returns the operator parameters from the configuration.
+
+    The returned dict can be updated, but nested values are shared with the
+    configuration and should be copied before being modified.
+    """
+    if override_label and not isinstance(override_label, str):
+        override_key = frozenset(override_label)
+    else:
+        override_key = override_label
+    key = (id(config), override_key)
+    with _operator_params_cache_lock:
+        cached = _operator_params_cache.get(key)
+        if cached is not None and cached[0] is config:
+            _operator_params_cache.move_to_end(key)
+            return dict(cached[1])
+    params = _resolve_operator_params(config, operator_type, override_label)
+    with _operator_params_cache_lock:
+        _operator_params_cache[key] = (config, params)
+        if len(_operator_params_cache) > _OPERATOR_PARAMS_CACHE_SIZE:
+            _operator_params_cache.popitem(last=False)
+    return dict(params)
+
+def _fast_clone(value):
+    """Deep copies a configuration value.
+
+    Configurations are expected to remain JSON-serializable (dicts, lists and
+    scalars), in which case they are copied with marshal which is much faster than
+    copy.deepcopy. Other values fall back to copy.deepcopy.
+    """
+    try:
+        return marshal.loads(marshal.dumps(value))
+    except ValueError:
+        return copy.deepcopy(value)
+
+def _resolve_operator_params(config, operator_type, override_label=None):
+    # The returned parameters share values with the configuration: only the
+    # sections updated by an override are copied.
+    params = {key: value for key, value in config.items() if key not in ("op", "overrides")}
+    override_config = config.get("overrides")
 
     if override_label and override_config:
         override = [ label for label in override_label if label in override_config ]
@@ -78,13 +131,18 @@ def get_operator_params(config, operator_type, override_label=None):
         if override_num == 1:
             override = override[0]
             override_config = override_config[override]
-            config = merge_config(config, override_config)
-    return config
+            # merge_config updates nested sections in place.
+            for key in override_config:
+                if key in params:
+                    params[key] = _fast_clone(params[key])
+            params = merge_config(params, override_config)
+    return params
 
 def _add_lang_info(operator_params, config, side):
     side_params = operator_params.get(side)
     if side_params is not None:
-        side_params["lang"] = config[side]
+        # The side parameters are shared with the configuration (see get_operator_params).
+        operator_params[side] = dict(side_params, lang=config[side])
     else:
         operator_params["%s_lang" % side] = config[side]
 
@@ -99,8 +157,9 @@ def build_operator(operator_type,
     """Creates an operator instance from its configuration."""
 
     # Propagate source and target languages
-    _add_lang_info(operator_params, global_config, "source")
-    _add_lang_info(operator_params, global_config, "target")
+    if operator_cls.needs_lang_info:
+        _add_lang_info(operator_params, global_config, "source")
+        _add_lang_info(operator_params, global_config, "target")
 
     args = []
     if shared_state:
@@ -115,6 +174,55 @@ def build_operator(operator_type,
     return operator
 
 
+def build_shared_state(preprocess_config,
+                       process_type,
+                       override_label=None,
+                       preprocess_exit_step=None,
+                       instances=None,
+                       create_instance=None):
+    """Creates the objects that operators declare as shared.
+
+    Args:
+      preprocess_config: The preprocessing configuration.
+      process_type: The type of processing pipeline.
+      override_label: The corpus label used to override the operator configuration.
+      preprocess_exit_step: The index of the last preprocessing operator.
+      instances: Existing instances that can be reused, indexed by operator position.
+        New instances are also registered in this dict.
+      create_instance: A function ``(cls, args)`` creating a shared instance
+        (e.g. as a multiprocessing proxy). Defaults to ``cls(*args)``.
+
+    Returns:
+      A dict mapping the operator position to its shared state.
+    """
+    if instances is None:
+        instances = collections.defaultdict(dict)
+    shared_state = collections.defaultdict(dict)
+    for operator_cls, operator_params, _, i in operator_info_generator(
+            preprocess_config,
+            process_type,
+            override_label,
+            preprocess_exit_step):
+        builders = operator_cls.get_shared_builders(operator_params, process_type)
+        if not builders:
+            continue
+        existing_state = instances[i]
+        for name, (cls, args) in builders.items():
+            key = "%s_%s" % (cls.__name__, str(args))
+            if key not in existing_state:
+                logger.info(
+                    'Building %s(%s)',
+                    cls.__name__,
+                    ', '.join(repr(arg) for arg in args),
+                )
+                if create_instance is not None:
+                    existing_state[key] = create_instance(cls, args)
+                else:
+                    existing_state[key] = cls(*args)
+            shared_state[i][name] = existing_state[key]
+    return shared_state
+
+
 class ProcessType(object):
       """Type of processing pipeline.
 
@@ -157,6 +265,11 @@ class Pipeline(object):
         # Passed to and modified by operator initializers if necessary.
         self.build_state = dict(self.start_state)
 
+        # Operators execution time is only collected in training, unless disabled.
+        self._profile = (
+            process_type == ProcessType.TRAINING
+            and get_data_option(config, "profile_operators"))
+
         self._build_pipeline(config, preprocess_exit_step, shared_state)
 
     @property
@@ -188,6 +301,14 @@ class Pipeline(object):
         self._config = config
         preprocess_config = config.get("preprocess")
         if preprocess_config:
+            if shared_state is None:
+                # Standalone pipeline: build the shared objects locally.
+                shared_state = build_shared_state(
+                    preprocess_config,
+                    self._process_type,
+                    override_label=self.override_label,
+                    preprocess_exit_step=preprocess_exit_step,
+                )
             self._add_op_list(
                 preprocess_config,
                 exit_step=preprocess_exit_step,
@@ -210,34 +331,93 @@ class Pipeline(object):
             if postprocess_config:
                 self._add_op_list(postprocess_config)
 
+        # Apply consecutive TU operators in a single iteration over the batch.
+        # The operators are frozen once built: a pipeline can then be shared by
+        # concurrent requests (see InferenceProcessor).
+        self._ops = tuple(_fuse_tu_operators(self._ops, self._process_type, profile=self._profile))
+
+        # Resolve operator attributes once instead of for each batch.
+        self._op_plan = tuple((op, op.name, op.accept_options()) for op in self._ops)
+        self._ops_accept_options = any(accept_options for _, _, accept_options in self._op_plan)
+
+
+    def export_batch(self, tu_list):
+        """Exports the TUs returned by the pipeline.
+
+        In postprocess, returns the list of postprocessed targets. Otherwise, returns
+        a tu.PreprocessOutputs structure.
+        """
+        if self._process_type == ProcessType.POSTPROCESS:
+            return [tu.export(self._process_type) for tu in tu_list]
+        # Imported here as the tu module depends on this module.
+        from nmtwizard.preprocess.tu import PreprocessOutputs
+        return PreprocessOutputs.from_fields([tu.export_fields() for tu in tu_list])
+
 
     def __call__(self, tu_batch, options=None):
-        if self._process_type == ProcessType.TRAINING:
-            ops_profile = collections.defaultdict(float)
+        if options and not self._ops_accept_options:
+            # No operator accepts runtime options: check none were passed and ignore them.
+            for _, name, _ in self._op_plan:
+                if options.get(name) is not None:
+                    raise RuntimeError("Operator %s does not accept runtime options" % name)
+            options = None
+
+        if self._profile:
+            ops_profile = [0.0] * len(self._op_plan)
+            get_time = time.perf_counter
+            start = get_time()
         else:
             ops_profile = None
 
-        for op in self._ops:
-            if ops_profile is not None:
-                start = time.time()
+        log_debug = logger.debug
+
+        if not options:
+            for i, (op, name, _) in enumerate(self._op_plan):
+                log_debug('Applying operator %s', name)
+                tu_batch = op(tu_batch)
 
-            kwargs = {}
-            op_options = options.get(op.name) if options else None
-            if op_options is not None:
-                if not op.accept_options():
-                    raise RuntimeError("Operator %s does not accept runtime options" % op.name)
-                kwargs["options"] = op_options
+                if ops_profile is not None:
+                    end = get_time()
+                    ops_profile[i] = end - start
+                    start = end
 
-            logger.debug('Applying operator %s', op.name)
-            tu_batch = op(tu_batch, **kwargs)
+        else:
+            # Resolve the options of each operator before applying them.
+            ops_options = [options.get(name) for _, name, _ in self._op_plan]
+            for (_, name, accept_options), op_options in zip(self._op_plan, ops_options):
+                if op_options is not None and not accept_options:
+                    raise RuntimeError("Operator %s does not accept runtime options" % name)
+
+            for i, ((op, name, _), op_options) in enumerate(zip(self._op_plan, ops_options)):
+                log_debug('Applying operator %s', name)
+                if op_options is None:
+                    tu_batch = op(tu_batch)
+                else:
+                    tu_batch = op(tu_batch, options=op_options)
 
-            if ops_profile is not None:
-                end = time.time()
-                ops_profile[op.name] += end - start
+                if ops_profile is not None:
+                    end = get_time()
+                    ops_profile[i] = end - start
+                    start = end
 
         tu_list, batch_meta = tu_batch
         if ops_profile is not None:
-            batch_meta['ops_profile'] = ops_profile
+            stages_profile = batch_meta.pop('stages_profile', None)
+            profile = collections.defaultdict(float)
+            for (op, name, _), value in zip(self._op_plan, ops_profile):
+                stage_times = stages_profile.get(name) if stages_profile else None
+                if stage_times is None:
+                    profile[name] += value
+                    continue
+                # Fused operators report the time of each operator they apply: split
+                # the total time accordingly.
+                total_time = sum(stage_times)
+                for stage_name, stage_time in zip(op.stage_names, stage_times):
+                    if total_time > 0:
+                        profile[stage_name] += value * stage_time / total_time
+                    else:
+                        profile[stage_name] += value / len(stage_times)
+            batch_meta['ops_profile'] = profile
 
         for tu in tu_list:
             tu.finalize(self._process_type)
@@ -245,10 +425,13 @@ class Pipeline(object):
         return tu_list, batch_meta
 
 
-@six.add_metaclass(abc.ABCMeta)
-class Operator(object):
+class Operator(abc.ABC):
     """Base class for preprocessing operators."""
 
+    # Set to True in operators that read the source and target languages from
+    # their parameters (see _add_lang_info).
+    needs_lang_info = False
+
     def __init__(self, params, process_type, build_state):
         pass
 
@@ -292,6 +475,15 @@ class Operator(object):
         return False
 
 
+    @staticmethod
+    def supports_batch():
+        """Returns True if the operator should process all TUs of a batch at once.
+
+        Batch operators are not fused with their neighbours (see _FusedTUOperator).
+        """
+        return False
+
+
     # When the preprocessing is running in parallel, the state of each operator is
     # duplicated in each worker process. This can be an issue for resources that
     # use a lot of memory. The methods below allow building objects that will be
@@ -312,12 +504,22 @@ class Operator(object):
 class TUOperator(Operator):
     """Base class for operations iterating on each TU in a batch."""
 
+    # Set to True in operators that always produce exactly one TU for each input TU.
+    # In this case, _preprocess_tu returns the TU itself instead of a list.
+    _one_to_one = False
+
     def _preprocess(self, tu_batch, **kwargs):
         # TU operator applies an action to each tu.
         # The action yields zero, one or more element for the new list
         tu_list, meta_batch = tu_batch
-        tu_list = list(chain.from_iterable(
-            self._preprocess_tu(tu, meta_batch, **kwargs) for tu in tu_list))
+        preprocess_tu = self._get_preprocess_tu()
+        if self._one_to_one:
+            tu_list = [preprocess_tu(tu, meta_batch, **kwargs) for tu in tu_list]
+        else:
+            tu_list = [
+                new_tu
+                for tu in tu_list
+                for new_tu in preprocess_tu(tu, meta_batch, **kwargs)]
         return tu_list, meta_batch
 
 
@@ -332,6 +534,11 @@ class TUOperator(Operator):
         raise NotImplementedError()
 
 
+    def _get_preprocess_tu(self):
+        """Returns the function applied by _preprocess on each TU."""
+        return self._preprocess_tu
+
+
     def _postprocess_tu(self, tu, **kwargs):
         raise NotImplementedError()
 
@@ -339,6 +546,11 @@ class TUOperator(Operator):
 class MonolingualOperator(TUOperator):
     """Base class for operations applying monolingual processing in each TU in a batch."""
 
+    needs_lang_info = True
+
+    # Built on first use by _get_preprocess_tu.
+    _specialized_preprocess_tu = None
+
     def __init__(self, config, process_type, build_state):
         self._postprocess_only = build_state.get("postprocess_only")
         self._process_type = process_type
@@ -352,12 +564,15 @@ class MonolingualOperator(TUOperator):
             # For postprocess only, the config only applies to the target.
             self._target_process = self._build_process(config, "target", build_state)
         else:
+            # Side configurations are copied as _build_process may update them.
             source_config = config.get("source")
             if source_config is not None:
-                self._source_process = self._build_process(source_config, "source", build_state)
+                self._source_process = self._build_process(
+                    dict(source_config), "source", build_state)
             target_config = config.get("target")
             if target_config is not None:
-                self._target_process = self._build_process(target_config, "target", build_state)
+                self._target_process = self._build_process(
+                    dict(target_config), "target", build_state)
 
 
     @abc.abstractmethod
@@ -397,7 +612,134 @@ class MonolingualOperator(TUOperator):
                     tgt_tok = self._apply_process(self._target_process, tok, **kwargs)
                     tu.set_tgt_tok(tgt_tok, name)
 
-        return [tu]
+        return tu if self._one_to_one else [tu]
+
+
+    def _preprocess(self, tu_batch, **kwargs):
+        if not self.supports_batch():
+            return super()._preprocess(tu_batch, **kwargs)
+        tu_list, meta_batch = tu_batch
+        self.apply_batch(tu_list, meta_batch, **kwargs)
+        return tu_list, meta_batch
+
+
+    def apply_batch(self, tu_list, meta_batch, **kwargs):
+        """Applies the processes on all TUs of the batch.
+
+        The inputs of each side are gathered from all TUs, processed with a single call
+        to _apply_process_batch, and the results are set back in the TUs.
+        """
+        options = kwargs.get("options") # Inference options are only applied in source in preprocess.
+        if self._source_process is not None or options:
+            if self._detok:
+                self._apply_batch_on_side(
+                    self._source_process, tu_list, "src_detok_gen", "set_src_detok", **kwargs)
+            else:
+                self._apply_batch_on_side(
+                    self._source_process, tu_list, "src_tok_gen", "set_src_tok", **kwargs)
+
+        if self._target_process is not None:
+            if self._detok:
+                self._apply_batch_on_side(
+                    self._target_process, tu_list, "tgt_detok_gen", "set_tgt_detok", **kwargs)
+            else:
+                self._apply_batch_on_side(
+                    self._target_process, tu_list, "tgt_tok_gen", "set_tgt_tok", **kwargs)
+
+
+    def _apply_batch_on_side(self, process, tu_list, getter, setter, **kwargs):
+        if not tu_list:
+            return
+        # Resolve the TU accessors once for the batch.
+        tu_cls = type(tu_list[0])
+        get_args = getattr(tu_cls, getter)
+        set_result = getattr(tu_cls, setter)
+
+        # Gather the side inputs in parallel lists: the owning TU, the side name,
+        # and the input to process.
+        owners = []
+        names = []
+        args = []
+        for tu in tu_list:
+            for name, arg in get_args(tu):
+                owners.append(tu)
+                names.append(name)
+                args.append(arg)
+
+        results = self._apply_process_batch(process, args, **kwargs)
+        for tu, name, result in zip(owners, names, results):
+            set_result(tu, result, name)
+
+
+    def _apply_process_batch(self, process, args, **kwargs):
+        """Applies the process on a list of inputs.
+
+        Operators with a native batch API should override this method and
+        supports_batch().
+        """
+        return [self._apply_process(process, arg, **kwargs) for arg in args]
+
+
+    def _get_preprocess_tu(self):
+        # Subclasses that override _preprocess_tu are applied as is.
+        if type(self)._preprocess_tu is not MonolingualOperator._preprocess_tu:
+            return self._preprocess_tu
+        preprocess_tu = self._specialized_preprocess_tu
+        if preprocess_tu is None:
+            # Built on the first batch, when subclass constructors have completed.
+            preprocess_tu = self._specialized_preprocess_tu = self._make_preprocess_tu()
+        return preprocess_tu
+
+    def _make_preprocess_tu(self):
+        """Returns a _preprocess_tu function specialized for this operator.
+
+        The processes and the _detok property are fixed for the operator lifetime, so
+        the sides to process are selected once here instead of for each TU. The generic
+        implementation is still used when runtime options are passed.
+        """
+        generic_preprocess_tu = self._preprocess_tu
+        one_to_one = self._one_to_one
+        side_fns = []
+        if self._source_process is not None:
+            side_fns.append(self._ptu_src_detok if self._detok else self._ptu_src_tok)
+        if self._target_process is not None:
+            side_fns.append(self._ptu_tgt_detok if self._detok else self._ptu_tgt_tok)
+
+        if len(side_fns) == 1:
+            side_fn = side_fns[0]
+
+            def _preprocess_tu(tu, meta_batch, **kwargs):
+                if kwargs:
+                    return generic_preprocess_tu(tu, meta_batch, **kwargs)
+                side_fn(tu)
+                return tu if one_to_one else [tu]
+
+        else:
+
+            def _preprocess_tu(tu, meta_batch, **kwargs):
+                if kwargs:
+                    return generic_preprocess_tu(tu, meta_batch, **kwargs)
+                for side_fn in side_fns:
+                    side_fn(tu)
+                return tu if one_to_one else [tu]
+
+        return _preprocess_tu
+
+    def _ptu_src_detok(self, tu):
+        for name, detok in tu.src_detok_gen():
+            tu.set_src_detok(self._apply_process(self._source_process, detok), name)
+
+    def _ptu_src_tok(self, tu):
+        for name, tok in tu.src_tok_gen():
+            tu.set_src_tok(self._apply_process(self._source_process, tok), name)
+
+    def _ptu_tgt_detok(self, tu):
+        for name, detok in tu.tgt_detok_gen():
+            tu.set_tgt_detok(self._apply_process(self._target_process, detok), name)
+
+    def _ptu_tgt_tok(self, tu):
+        for name, tok in tu.tgt_tok_gen():
+            tu.set_tgt_tok(self._apply_process(self._target_process, tok), name)
 
 
     def _postprocess_tu(self, tu, **kwargs):
@@ -418,6 +760,7 @@ class Filter(TUOperator):
         if criteria is None:
             criteria = []
         self._criteria = criteria
+        self._predicate = _compile_criteria(criteria)
 
 
     @staticmethod
@@ -434,8 +777,136 @@ class Filter(TUOperator):
         return tu_batch
 
 
+    def _preprocess(self, tu_batch):
+        if type(self)._preprocess_tu is not Filter._preprocess_tu:
+            # Subclasses that override _preprocess_tu are applied on each TU.
+            return super()._preprocess(tu_batch)
+        tu_list, meta_batch = tu_batch
+        predicate = self._predicate
+        if predicate is not None:
+            tu_list = [tu for tu in tu_list if not predicate(tu)]
+        return tu_list, meta_batch
+
+
     def _preprocess_tu(self, tu, meta_batch):
-        for c in self._criteria:
-            if (c(tu)):
-                return []
+        predicate = self._predicate
+        if predicate is not None and predicate(tu):
+            return []
         return [tu]
+
+
+def _compile_criteria(criteria):
+    """Combines the filter criteria into a single predicate returning True if the
+    TU should be removed. Returns None if there is no criterion.
+    """
+    if not criteria:
+        return None
+    if len(criteria) == 1:
+        return criteria[0]
+    criteria = tuple(criteria)
+
+    def _predicate(tu):
+        for c in criteria:
+            if c(tu):
+                return True
+        return False
+
+    return _predicate
+
+
+def _is_fusable(op, process_type):
+    """Returns True if the operator only defines a per-TU processing."""
+    if not isinstance(op, TUOperator) or op.accept_options() or op.supports_batch():
+        return False
+    op_cls = type(op)
+    if op_cls.__call__ not in (Operator.__call__, Filter.__call__):
+        return False
+    if process_type == ProcessType.POSTPROCESS:
+        return op_cls._postprocess is TUOperator._postprocess
+    return op_cls._preprocess in (
+        TUOperator._preprocess, MonolingualOperator._preprocess, Filter._preprocess)
+
+
+def _fuse_tu_operators(ops, process_type, profile=False):
+    """Replaces runs of consecutive TU operators by a single fused operator."""
+    fused_ops = []
+    run = []
+    for op in ops + [None]:
+        if op is not None and _is_fusable(op, process_type):
+            run.append(op)
+            continue
+        if len(run) > 1:
+            fused_ops.append(_FusedTUOperator(run, process_type, profile=profile))
+        else:
+            fused_ops.extend(run)
+        run = []
+        if op is not None:
+            fused_ops.append(op)
+    return fused_ops
+
+
+class _FusedTUOperator(Operator):
+    """Applies a sequence of TU operators to each TU in a single pass over the batch.
+
+    This avoids materializing an intermediate TU list for each operator. When profile
+    is set, the time spent in each operator is reported in the batch metadata.
+    """
+
+    def __init__(self, ops, process_type, profile=False):
+        self._ops = ops
+        self._name = "+".join(op.name for op in ops)
+        self._process_type = process_type
+        self._profile = profile
+
+    @property
+    def stage_names(self):
+        """The names of the fused operators."""
+        return [op.name for op in self._ops]
+
+    def _preprocess(self, tu_batch):
+        tu_list, meta_batch = tu_batch
+        stages = [(op._get_preprocess_tu(), op._one_to_one) for op in self._ops]
+        num_removed = [0] * len(stages)
+        stage_times = [0.0] * len(stages) if self._profile else None
+        get_time = time.perf_counter
+        new_tu_list = []
+
+        for tu in tu_list:
+            tus = [tu]
+            if stage_times is not None:
+                start = get_time()
+            for i, (preprocess_tu, one_to_one) in enumerate(stages):
+                if one_to_one:
+                    tus = [preprocess_tu(t, meta_batch) for t in tus]
+                else:
+                    new_tus = [new_tu for t in tus for new_tu in preprocess_tu(t, meta_batch)]
+                    num_removed[i] += len(tus) - len(new_tus)
+                    tus = new_tus
+                if stage_times is not None:
+                    end = get_time()
+                    stage_times[i] += end - start
+                    start = end
+                if not tus:
+                    break
+            new_tu_list.extend(tus)
+
+        # Report filtered TUs as if filters were applied separately.
+        for op, removed in zip(self._ops, num_removed):
+            if isinstance(op, Filter):
+                filter_summary = meta_batch.setdefault("filter_summary", collections.defaultdict(int))
+                filter_summary[op.name] += removed
+
+        if stage_times is not None:
+            meta_batch.setdefault("stages_profile", {})[self.name] = stage_times
+
+        return new_tu_list, meta_batch
+
+    def _postprocess(self, tu_batch):
+        tu_list, meta_batch = tu_batch
+        stages = [op._postprocess_tu for op in self._ops]
+        new_tu_list = []
+        for tu in tu_list:
+            for postprocess_tu in stages:
+                tu = postprocess_tu(tu)
+            new_tu_list.append(tu)
+        return new_tu_list, meta_batch
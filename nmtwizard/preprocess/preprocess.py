@@ -1,10 +1,19 @@
 """Functions for corpus preprocessing."""
 
-import copy
 import collections
+import hashlib
+import itertools
+import json
+import logging
 import multiprocessing
 import multiprocessing.managers
 import os
+import pickle
+import queue
+import shutil
+import tempfile
+import threading
+
 
 from nmtwizard import config as config_util
 from nmtwizard import utils
@@ -16,8 +25,6 @@ from nmtwizard.preprocess import sampler
 from nmtwizard.preprocess import tokenizer
 from nmtwizard.preprocess.tu import TranslationUnit
 
-import subprocess
-import pdb
 
 logger = get_logger(__name__)
 
@@ -33,35 +40,45 @@ def _get_tok_configs(config):
 
 def _get_num_workers():
     num_cpus = int(os.environ.get('NB_CPU', '1'))
+    if num_cpus < 0:
+        # Negative values follow the joblib convention: -1 uses all CPUs,
+        # -2 all CPUs but one, etc.
+        num_cpus = max(multiprocessing.cpu_count() + 1 + num_cpus, 1)
     return num_cpus if num_cpus > 1 else 0  # Run the sequential path if only 1 CPU is available.
 
-def _get_corpus_label(tu_batch):
-    _, batch_meta = tu_batch
-    label = batch_meta.get('label') if batch_meta else None
+def _normalize_corpus_label(label):
     if label:
-        if isinstance(label, list):
-            label = set(label)
+        # Labels are returned as frozensets so that they can be used as cache keys.
+        if isinstance(label, (list, set)):
+            label = frozenset(label)
         elif isinstance(label, str):
-            label = { label }
+            label = frozenset((label,))
     return label
 
-def _get_corpus_name(tu_batch):
-    _, batch_meta = tu_batch
-    return batch_meta.get('base_name')
+# Maximum number of pipelines (one per corpus label) cached in each process.
+_MAX_CACHED_PIPELINES = 8
 
-def _process_batch(
-        pipeline,
-        tu_batch,
-        options=None,
-        # Arguments below are used to rebuild the pipeline, if required.
-        config=None,
-        process_type=None,
+def _get_pipeline_key(override_label):
+    if isinstance(override_label, dict):
+        return json.dumps(override_label, sort_keys=True)
+    return override_label
+
+def _get_pipeline(
+        pipelines,
+        config,
+        process_type,
         exit_step=None,
         override_label=None,
         shared_state=None,
 ):
-    """Rebuilds the pipeline if required and processes a batch of TUs."""
-    if pipeline is None or override_label != pipeline.override_label:
+    """Returns the pipeline for a corpus label, building it if required.
+
+    Pipelines are cached by corpus label in the OrderedDict pipelines, from the least
+    to the most recently used.
+    """
+    pipeline_key = _get_pipeline_key(override_label)
+    pipeline = pipelines.get(pipeline_key)
+    if pipeline is None:
         if override_label is None:
             logger.info('Building default processing pipeline')
         else:
@@ -72,56 +89,197 @@ def _process_batch(
             preprocess_exit_step=exit_step,
             override_label=override_label,
             shared_state=shared_state)
+        pipelines[pipeline_key] = pipeline
+        if len(pipelines) > _MAX_CACHED_PIPELINES:
+            pipelines.popitem(last=False)
+    else:
+        pipelines.move_to_end(pipeline_key)
+    return pipeline
 
-    tu_list, batch_meta = tu_batch
-    base_name = _get_corpus_name(tu_batch)
-    logger.info(
-        'Processing %d samples%s',
-        len(tu_list),
-        ' from %s' % base_name if base_name is not None else '',
-    )
-
-    tu_list, batch_meta = pipeline(tu_batch, options=options)
-    outputs = [tu.export(pipeline.process_type) for tu in tu_list]
-    return (outputs, batch_meta), pipeline
-
-# In multiprocessing, we can't build the pipeline in the master process and pass it to
-# the worker process because some resources may not be serializable. Instead, the pipeline
-# is defined as a global variable that is local to each worker process.
-worker_pipeline = None
-
-def _process_batch_on_worker(
+def _process_batch(
+        pipelines,
         tu_batch,
         options=None,
-        # Arguments below are used to rebuild the pipeline, if required.
+        # Arguments below are used to build the pipeline, if required.
         config=None,
         process_type=None,
         exit_step=None,
         override_label=None,
         shared_state=None,
 ):
-    """Processes a batch of TUs using the pipeline cached on the worker process."""
-    global worker_pipeline
-    try:
-        outputs, worker_pipeline = _process_batch(
-            worker_pipeline,
-            tu_batch,
-            options=options,
-            config=config,
-            process_type=process_type,
-            exit_step=exit_step,
-            override_label=override_label,
-            shared_state=shared_state,
+    """Processes a batch of TUs with the pipeline for its corpus label (see _get_pipeline)."""
+    pipeline = _get_pipeline(
+        pipelines,
+        config,
+        process_type,
+        exit_step=exit_step,
+        override_label=override_label,
+        shared_state=shared_state,
+    )
+
+    # Skip formatting the message when it is not logged.
+    if logger.isEnabledFor(logging.INFO):
+        tu_list, batch_meta = tu_batch
+        base_name = batch_meta.get('base_name')
+        logger.info(
+            'Processing %d samples%s',
+            len(tu_list),
+            ' from %s' % base_name if base_name is not None else '',
         )
-    except Exception as e:
-        corpus_name = _get_corpus_name(tu_batch)
-        worker_name = multiprocessing.current_process().name
-        raise RuntimeError(
-            "An exception occured %sin worker process %s (see above)" % (
-                "when processing file '%s' " % corpus_name if corpus_name else "",
-                worker_name,
-            )) from e
-    return outputs
+
+    tu_list, batch_meta = pipeline(tu_batch, options=options)
+    outputs = pipeline.export_batch(tu_list)
+    return outputs, batch_meta
+
+# In multiprocessing, we can't build the pipeline in the master process and pass it to
+# the worker process because some resources may not be serializable. Instead, the pipelines
+# are cached in a global variable that is local to each worker process.
+worker_pipelines = collections.OrderedDict()
+
+# Arguments that are the same for all batches of a processing stage are written once
+# per stage in the context directory of the pool, and read once by each worker. A pool
+# can be reused for several stages, so each context is identified by a generation
+# number which is the only context information sent with the tasks.
+_worker_context = {}
+_worker_context_dir = None
+_worker_context_generations = itertools.count(1)
+
+def _init_worker(context_dir):
+    global _worker_context_dir
+    _worker_context_dir = context_dir
+
+def _get_worker_context_path(context_dir, generation):
+    return os.path.join(context_dir, "context-%d.pkl" % generation)
+
+def _update_worker_context(generation):
+    """Loads the processing context in the worker process if it changed."""
+    if _worker_context.get("generation") == generation:
+        return
+    with open(_get_worker_context_path(_worker_context_dir, generation), "rb") as context_file:
+        context = pickle.load(context_file)
+    _worker_context.clear()
+    _worker_context.update(context, generation=generation)
+    # Pipelines built for a previous stage may use a different configuration.
+    worker_pipelines.clear()
+    prepoperator.clear_operator_params_cache()
+
+def _create_worker_pool(num_workers):
+    """Creates a pool of worker processes and its context directory."""
+    context_dir = tempfile.mkdtemp(prefix="preprocess_context_")
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Forked workers do not have to import the modules again.
+        mp_context = multiprocessing.get_context("fork")
+    else:
+        mp_context = multiprocessing.get_context()
+    pool = mp_context.Pool(
+        processes=num_workers,
+        initializer=_init_worker,
+        initargs=(context_dir,),
+    )
+    return pool, context_dir
+
+def _close_worker_pool(pool, context_dir):
+    """Terminates the worker processes and removes the context directory."""
+    pool.terminate()
+    pool.join()
+    shutil.rmtree(context_dir, ignore_errors=True)
+
+def _process_batches_on_worker(generation, tu_batches, override_label=None, shared_state=None):
+    """Processes a group of batches with the same corpus label using the pipeline
+    cached on the worker process.
+    """
+    _update_worker_context(generation)
+    all_outputs = []
+    for tu_batch in tu_batches:
+        try:
+            outputs = _process_batch(
+                worker_pipelines,
+                tu_batch,
+                options=_worker_context["options"],
+                config=_worker_context["config"],
+                process_type=_worker_context["process_type"],
+                exit_step=_worker_context["exit_step"],
+                override_label=override_label,
+                shared_state=shared_state,
+            )
+        except Exception as e:
+            corpus_name = tu_batch[1].get('base_name')
+            worker_name = multiprocessing.current_process().name
+            raise RuntimeError(
+                "An exception occured %sin worker process %s (see above)" % (
+                    "when processing file '%s' " % corpus_name if corpus_name else "",
+                    worker_name,
+                )) from e
+        all_outputs.append(outputs)
+    return all_outputs
+
+def _process_task_on_worker(task):
+    return _process_batches_on_worker(*task)
+
+def _prefetch(iterable, max_size):
+    """Iterates on iterable from a background thread, reading up to max_size items
+    in advance.
+    """
+    items = queue.Queue(maxsize=max_size)
+    stop_event = threading.Event()
+    end = object()
+
+    def _put(item):
+        # Do not block forever if the consumer stopped iterating.
+        while not stop_event.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put((item, None)):
+                    return
+            _put((end, None))
+        except Exception as e:
+            _put((end, e))
+
+    thread = threading.Thread(target=_produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop_event.set()
+        thread.join()
+
+def _group_batches(tu_batches, group_size, get_label):
+    """Groups consecutive batches with the same corpus label.
+
+    get_label returns a tuple (override_label, shared_state) for a batch.
+    Yields tuples (override_label, shared_state, tu_batches) with at most group_size
+    batches.
+    """
+    group = []
+    group_label = None
+    group_shared_state = None
+    for tu_batch in tu_batches:
+        override_label, shared_state = get_label(tu_batch)
+        if group and override_label != group_label:
+            yield group_label, group_shared_state, group
+            group = []
+        group_label = override_label
+        group_shared_state = shared_state
+        group.append(tu_batch)
+        if len(group) == group_size:
+            yield group_label, group_shared_state, group
+            group = []
+    if group:
+        yield group_label, group_shared_state, group
 
 
 class Processor(object):
@@ -133,6 +291,10 @@ class Processor(object):
         self._config = config
         self._pipeline_type = pipeline_type
 
+        # The configuration may have been updated in place since operator parameters
+        # were last resolved.
+        prepoperator.clear_operator_params_cache()
+
         # The global shared state contains all objects that are shared accross workers.
         # It includes shared objects defined in the main configuration as well as shared
         # objects that are corpus-specific.
@@ -141,6 +303,46 @@ class Processor(object):
             self._pipeline_type,
             num_workers=self._num_workers)
 
+        # Corpus labels and shared states, keyed by the identity of the label object
+        # in the batch metadata: loaders reuse the same object for all batches of a file.
+        self._label_cache = {}
+
+        # Pool of worker processes that is reused by all processing stages until the
+        # processor is closed. When not set, a pool is created for each stage.
+        self._pool = None
+        self._pool_context_dir = None
+
+    def __enter__(self):
+        if self._num_workers > 0 and self._pool is None:
+            self._pool, self._pool_context_dir = _create_worker_pool(self._num_workers)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Terminates the worker processes owned by this processor, if any."""
+        if self._pool is not None:
+            _close_worker_pool(self._pool, self._pool_context_dir)
+            self._pool = None
+            self._pool_context_dir = None
+
+    def _get_label(self, tu_batch):
+        """Returns the corpus label of a batch and the associated shared state."""
+        _, batch_meta = tu_batch
+        return self._resolve_label(batch_meta.get('label') if batch_meta else None)
+
+    def _resolve_label(self, raw_label):
+        """Returns the normalized corpus label and the associated shared state."""
+        cached = self._label_cache.get(id(raw_label))
+        # The label object is also kept in the entry so that its id is not reused.
+        if cached is None or cached[0] is not raw_label:
+            override_label = _normalize_corpus_label(raw_label)
+            shared_state = self._global_shared_state.get(override_label)
+            cached = (raw_label, override_label, shared_state)
+            self._label_cache[id(raw_label)] = cached
+        return cached[1], cached[2]
+
     def process(self,
                 loader,
                 consumer,
@@ -148,14 +350,22 @@ class Processor(object):
                 options=None,
                 pipeline=None):
 
+        # Previous stages may have updated the configuration in place (e.g. to set
+        # the path to the generated models).
+        prepoperator.clear_operator_params_cache()
+
         if self._num_workers == 0:
             logger.info('Start processing')
 
-            for tu_batch in loader():
-                override_label = _get_corpus_label(tu_batch)
-                shared_state = self._global_shared_state.get(override_label)
-                outputs, pipeline = _process_batch(
-                    pipeline,
+            pipelines = collections.OrderedDict()
+            if pipeline is not None:
+                pipelines[_get_pipeline_key(pipeline.override_label)] = pipeline
+
+            # Load the next batch while the current one is processed.
+            for tu_batch in _prefetch(loader(), 1):
+                override_label, shared_state = self._get_label(tu_batch)
+                outputs = _process_batch(
+                    pipelines,
                     tu_batch,
                     options=options,
                     config=self._config,
@@ -174,40 +384,83 @@ class Processor(object):
             # that it duplicates resources for each worker, increasing the
             # memory usage. This is mitigated by the better stream processing of
             # the loader/consumer which avoids loading the full corpus in memory.
-            with multiprocessing.Pool(processes=self._num_workers) as pool:
-                results = collections.deque()
-
-                for tu_batch in loader():
-                    override_label = _get_corpus_label(tu_batch)
-                    shared_state = self._global_shared_state.get(override_label)
-
-                    # Push the batch in the process queue and get a handle on the result.
-                    results.append(pool.apply_async(
-                        _process_batch_on_worker,
-                        args=(
-                            tu_batch,
-                        ),
-                        kwds=dict(
-                            options=options,
-                            config=self._config,
-                            process_type=self._pipeline_type,
-                            exit_step=preprocess_exit_step,
-                            override_label=override_label,
-                            shared_state=shared_state,
-                        ),
-                    ))
-
-                    # Limit the queue max size to avoid loading too many batches in advance.
-                    if len(results) == 2 * self._num_workers:
-                        results[0].wait()
-
-                    # Consume batches that are ready.
-                    while len(results) > 0 and results[0].ready():
-                        consumer(results.popleft().get())
-
-                # Wait and consume all remaining batches.
-                while len(results) > 0:
-                    consumer(results.popleft().get())
+            worker_context = dict(
+                config=self._config,
+                process_type=self._pipeline_type,
+                exit_step=preprocess_exit_step,
+                options=options,
+            )
+
+            # Number of consecutive batches with the same label sent at once to a worker.
+            fetch_factor = config_util.get_data_option(self._config, 'fetch_factor')
+
+            # Completed tasks are reported by the pool callbacks, possibly out of order.
+            # Their results are passed to the consumer in the order of the batches.
+            max_pending_tasks = 2 * self._num_workers
+            completed = queue.Queue()
+            ready_results = {}
+            num_submitted = 0
+            num_consumed = 0
+
+            def _submit(task):
+                nonlocal num_submitted
+                index = num_submitted
+                pool.apply_async(
+                    _process_task_on_worker,
+                    (task,),
+                    callback=lambda result: completed.put((index, result, None)),
+                    error_callback=lambda error: completed.put((index, None, error)),
+                )
+                num_submitted += 1
+
+            def _consume_results(max_pending):
+                # Consumes the results that are ready, and waits for the next ones
+                # while more than max_pending tasks are not consumed.
+                nonlocal num_consumed
+                while num_consumed < num_submitted:
+                    wait = num_submitted - num_consumed > max_pending
+                    while num_consumed not in ready_results:
+                        try:
+                            index, result, error = completed.get(block=wait)
+                        except queue.Empty:
+                            return
+                        ready_results[index] = (result, error)
+                    result, error = ready_results.pop(num_consumed)
+                    num_consumed += 1
+                    if error is not None:
+                        raise error
+                    for outputs in result:
+                        consumer(outputs)
+
+            owns_pool = self._pool is None
+            if owns_pool:
+                pool, context_dir = _create_worker_pool(self._num_workers)
+            else:
+                pool, context_dir = self._pool, self._pool_context_dir
+            generation = next(_worker_context_generations)
+            context_path = _get_worker_context_path(context_dir, generation)
+            # Load the next batches while waiting for the workers.
+            tu_batches = _prefetch(loader(), self._num_workers)
+            try:
+                with open(context_path, "wb") as context_file:
+                    pickle.dump(worker_context, context_file, protocol=pickle.HIGHEST_PROTOCOL)
+                for override_label, shared_state, group in _group_batches(
+                        tu_batches, fetch_factor, self._get_label):
+                    _submit((generation, group, override_label, shared_state))
+                    _consume_results(max_pending_tasks - 1)
+                _consume_results(0)
+            except BaseException:
+                # Pending tasks should not keep running in a pool that is reused.
+                if not owns_pool:
+                    self.close()
+                raise
+            finally:
+                tu_batches.close()
+                if owns_pool:
+                    _close_worker_pool(pool, context_dir)
+                elif self._pool is not None and os.path.exists(context_path):
+                    # The context of this stage is no longer needed by the reused pool.
+                    os.remove(context_path)
 
 
 class TrainingProcessor(Processor):
@@ -316,39 +569,41 @@ class TrainingProcessor(Processor):
         if not tok_configs:
             raise RuntimeError('No \'tokenization\' operator in preprocess configuration, cannot build vocabularies.)')
 
-        for tok_idx, (prep_idx, tok_config) in enumerate(tok_configs):
-            if 'source' not in tok_config or 'target' not in tok_config:
-                raise RuntimeError('Each \'tokenization\' operator should contain '
-                                   'both \'source\' and \'target\' fields.')
-
-            for side in tok_config:
-                if side not in ["source", "target", "multi"]:
-                    continue
-                build_vocab = tok_config[side].get('build_vocabulary')
-                if build_vocab:
-                    if tok_config[side].get('vocabulary_path', {}):
-                        raise RuntimeError('Cannot build vocabulary if \'%s\' vocabulary path is already specified.' % side)
-                    if tok_idx == len(tok_configs)-1 and self._config.get('vocabulary',{}).get(side,{}).get('path'):
-                        raise RuntimeError('Cannot build vocabulary for final tokenization if \'%s\' vocabulary path for model is already specified.' % side)
-                    if not build_vocab.get('size'):
-                        raise RuntimeError('\'size\' option is mandatory to build vocabulary for \'%s\'.' % side)
-
-            self._generate_models(prep_idx, 'subword')
-
-            self._generate_models(prep_idx, 'vocabulary')
-
-            # Use vocabulary from final tokenization as vocabulary for translation framework.
-            if tok_idx == len(tok_configs)-1:
+        # The same worker processes are used for all tokenization blocks.
+        with self:
+            for tok_idx, (prep_idx, tok_config) in enumerate(tok_configs):
+                if 'source' not in tok_config or 'target' not in tok_config:
+                    raise RuntimeError('Each \'tokenization\' operator should contain '
+                                       'both \'source\' and \'target\' fields.')
+
                 for side in tok_config:
-                    if side == 'source' or side == 'target':
-                        if 'vocabulary' not in self._config:
-                            self._config['vocabulary'] = {}
-                        if side not in self._config['vocabulary']:
-                            self._config['vocabulary'][side] = {}
-                        self._config['vocabulary'][side]['path'] = tok_config[side]['vocabulary_path']
-                        # Only keep 'vocabulary_path' option for final tokenization if explicitly specified.
-                        if not tok_config[side].get('use_vocab_in_tok', False):
-                            del tok_config[side]['vocabulary_path']
+                    if side not in ["source", "target", "multi"]:
+                        continue
+                    build_vocab = tok_config[side].get('build_vocabulary')
+                    if build_vocab:
+                        if tok_config[side].get('vocabulary_path', {}):
+                            raise RuntimeError('Cannot build vocabulary if \'%s\' vocabulary path is already specified.' % side)
+                        if tok_idx == len(tok_configs)-1 and self._config.get('vocabulary',{}).get(side,{}).get('path'):
+                            raise RuntimeError('Cannot build vocabulary for final tokenization if \'%s\' vocabulary path for model is already specified.' % side)
+                        if not build_vocab.get('size'):
+                            raise RuntimeError('\'size\' option is mandatory to build vocabulary for \'%s\'.' % side)
+
+                self._generate_models(prep_idx, 'subword')
+
+                self._generate_models(prep_idx, 'vocabulary')
+
+                # Use vocabulary from final tokenization as vocabulary for translation framework.
+                if tok_idx == len(tok_configs)-1:
+                    for side in tok_config:
+                        if side == 'source' or side == 'target':
+                            if 'vocabulary' not in self._config:
+                                self._config['vocabulary'] = {}
+                            if side not in self._config['vocabulary']:
+                                self._config['vocabulary'][side] = {}
+                            self._config['vocabulary'][side]['path'] = tok_config[side]['vocabulary_path']
+                            # Only keep 'vocabulary_path' option for final tokenization if explicitly specified.
+                            if not tok_config[side].get('use_vocab_in_tok', False):
+                                del tok_config[side]['vocabulary_path']
 
         preprocess_config = None
         if "preprocess" in self._config:
@@ -364,6 +619,9 @@ class TrainingProcessor(Processor):
 
 class InferenceProcessor(Processor):
 
+    # Maximum number of pipelines built from configuration overrides to keep.
+    override_pipelines_cache_size = 32
+
     def __init__(self, config, postprocess=False):
         pipeline_type = (prepoperator.ProcessType.POSTPROCESS
                          if postprocess
@@ -372,6 +630,9 @@ class InferenceProcessor(Processor):
         self._postprocess = postprocess
         # Build a generic pipeline that will be used in process_input.
         self._pipeline = self.build_pipeline(self._config)
+        # Pipelines built for configuration overrides, in least recently used order.
+        self._override_pipelines = collections.OrderedDict()
+        self._override_pipelines_lock = threading.Lock()
 
     def build_pipeline(self, config):
         return prepoperator.Pipeline(
@@ -380,6 +641,27 @@ class InferenceProcessor(Processor):
             shared_state=self._global_shared_state.get(),
         )
 
+    def _get_override_pipeline(self, config):
+        """Returns the pipeline for a configuration override, building it if needed."""
+        key = hashlib.blake2b(
+            json.dumps(config, sort_keys=True, default=str).encode("utf-8")).digest()
+        with self._override_pipelines_lock:
+            pipeline = self._override_pipelines.get(key)
+            if pipeline is not None:
+                self._override_pipelines.move_to_end(key)
+                return pipeline
+
+        # The pipeline does not modify its configuration, so it can share the
+        # sections that are not overridden with the main configuration.
+        config = config_util.merged_config(self._config, config)
+        pipeline = self.build_pipeline(config)
+
+        with self._override_pipelines_lock:
+            self._override_pipelines[key] = pipeline
+            if len(self._override_pipelines) > self.override_pipelines_cache_size:
+                self._override_pipelines.popitem(last=False)
+        return pipeline
+
     def process_input(self,
                       source,
                       target=None,
@@ -411,8 +693,7 @@ class InferenceProcessor(Processor):
             if config_util.is_v2_config(self._config):
                 raise ValueError("Configuration override is not supported for V2 "
                                  "configurations")
-            config = config_util.merge_config(copy.deepcopy(self._config), config)
-            pipeline = self.build_pipeline(config)
+            pipeline = self._get_override_pipeline(config)
         else:
             pipeline = self._pipeline
 
@@ -435,9 +716,6 @@ class InferenceProcessor(Processor):
         if self._postprocess:
             return tu.tgt_detok
         src_tokens = tu.src_tok.tokens
-        subprocess.Popen(["echo", "************"])
-        subprocess.Popen(["echo", str(src_tokens)])
-        # pdb.set_trace()
         tgt_tokens = tu.tgt_tok.tokens if tu.tgt_tok is not None else [None for _ in src_tokens]
         return src_tokens, tgt_tokens, tu.metadata
 
@@ -495,12 +773,18 @@ class SharedState:
         self._manager = None
         self.get()  # Cache default shared state.
 
+    def _create_instance(self, cls, args):
+        if self._manager is not None:
+            return getattr(self._manager, cls.__name__)(*args)
+        return cls(*args)
+
     def get(self, override_label=None):
         """Returns the shared state for this configuration and corpus label."""
         if isinstance(override_label, dict):
             return None
-        override_label_str = repr(override_label)
-        cached_state = self._cached_state.get(override_label_str)
+        if isinstance(override_label, (list, set)):
+            override_label = frozenset(override_label)
+        cached_state = self._cached_state.get(override_label)
         if cached_state is not None:
             return cached_state
         preprocess_config = self._config.get("preprocess")
@@ -523,35 +807,13 @@ class SharedState:
             self._manager = SharedManager()
             self._manager.start()
 
-        all_builders = {}
-        for operator_cls, operator_params, _, i in prepoperator.operator_info_generator(
-                preprocess_config,
-                self._process_type,
-                override_label,
-                self._preprocess_exit_step):
-            # Save how to build shared classes for this operator.
-            builders = operator_cls.get_shared_builders(operator_params, self._process_type)
-            if builders:
-                all_builders[i] = builders
-
-        # Create all new shared instances.
-        shared_state = collections.defaultdict(dict)
-        for i, builders in all_builders.items():
-            existing_state = self._all_state[i]
-            for name, (cls, args) in builders.items():
-                key = "%s_%s" % (cls.__name__, str(args))
-                if key not in existing_state:
-                    logger.info(
-                        'Building %s(%s)',
-                        cls.__name__,
-                        ', '.join(repr(arg) for arg in args),
-                    )
-                    if self._manager is not None:
-                        shared_instance = getattr(self._manager, cls.__name__)(*args)
-                    else:
-                        shared_instance = cls(*args)
-                    existing_state[key] = shared_instance
-                shared_state[i].update({name: existing_state[key]})
-
-        self._cached_state[override_label_str] = shared_state
+        shared_state = prepoperator.build_shared_state(
+            preprocess_config,
+            self._process_type,
+            override_label=override_label,
+            preprocess_exit_step=self._preprocess_exit_step,
+            instances=self._all_state,
+            create_instance=self._create_instance,
+        )
+        self._cached_state[override_label] = shared_state
         return shared_state
@@ -47,6 +47,41 @@ class PreprocessOutput:
         self.alignment = alignment
 
 
+class PreprocessOutputs:
+    """Structure containing the preprocessing results of a batch.
+
+    Results are stored by columns, which is more compact to send between processes
+    than a list of PreprocessOutput. Iterating over the structure yields
+    PreprocessOutput instances.
+    """
+
+    __slots__ = ["src", "tgt", "metadata", "alignment"]
+
+    def __init__(self, src, tgt, metadata, alignment):
+        self.src = src
+        self.tgt = tgt
+        self.metadata = metadata
+        self.alignment = alignment
+
+    @classmethod
+    def from_fields(cls, fields):
+        """Builds the structure from (src, tgt, metadata, alignment) tuples."""
+        if not fields:
+            return cls([], [], [], [])
+        return cls(*(list(column) for column in zip(*fields)))
+
+    def __len__(self):
+        return len(self.src)
+
+    def __iter__(self):
+        for fields in zip(self.src, self.tgt, self.metadata, self.alignment):
+            yield PreprocessOutput(*fields)
+
+    def __getitem__(self, index):
+        return PreprocessOutput(
+            self.src[index], self.tgt[index], self.metadata[index], self.alignment[index])
+
+
 class TokReplace:
     """Structure for token replacement in tokenization."""
 
@@ -93,10 +128,15 @@ class Alignment(object):
         return self.__log_probs
 
     def set_alignments(self, aligner, src_tok, tgt_tok):
+        self.set_align_results([
+            aligner.align(src_tok_part, tgt_tok_part)
+            for src_tok_part, tgt_tok_part in zip(src_tok, tgt_tok)])
+
+    def set_align_results(self, align_results):
+        """Sets the alignments from the aligner results, one for each part."""
         alignments = []
         log_probs = []
-        for src_tok_part, tgt_tok_part in zip(src_tok, tgt_tok):
-            align_result = aligner.align(src_tok_part, tgt_tok_part)
+        for align_result in align_results:
             alignments.append(set(align_result["alignments"]))
             log_probs.append((
                 align_result["forward_log_prob"], align_result["backward_log_prob"]))
@@ -419,6 +459,11 @@ class TranslationUnit(object):
         self.__alignment = Alignment()
         self.__alignment.set_alignments(aligner, self.src_tok.tokens, self.tgt_tok.tokens)
 
+    def set_align_results(self, align_results):
+        """Sets the alignment from results computed by the caller, one for each part."""
+        self.__alignment = Alignment()
+        self.__alignment.set_align_results(align_results)
+
     @property
     def src_detok(self):
         return self.get_src_detok("main")
@@ -501,6 +546,10 @@ class TranslationUnit(object):
     def export(self, process_type):
         if process_type == prepoperator.ProcessType.POSTPROCESS:
             return self.tgt_detok
+        return PreprocessOutput(*self.export_fields())
+
+    def export_fields(self):
+        """Returns the preprocessing result as a tuple (src, tgt, metadata, alignment)."""
         src = self.src_tok.tokens
         if src is None:
             src = self.src_detok
@@ -512,12 +561,7 @@ class TranslationUnit(object):
             if tgt is None:
                 tgt = self.tgt_detok
 
-        return PreprocessOutput(
-            src=src,
-            tgt=tgt,
-            metadata=self.metadata,
-            alignment=self.alignment,
-        )
+        return src, tgt, self.metadata, self.alignment
 
     @property
     def metadata(self):
@@ -0,0 +1,76 @@
+import copy
+
+import pytest
+
+from nmtwizard import config as config_util
+
+
+def test_get_data_option_default():
+    assert config_util.get_data_option({}, "fetch_factor") == 1
+    assert config_util.get_data_option({"data": {}}, "profile_operators") is True
+
+
+@pytest.mark.parametrize("name,value", [
+    ("fetch_factor", 1),
+    ("fetch_factor", 8),
+    ("profile_operators", False),
+])
+def test_get_data_option(name, value):
+    assert config_util.get_data_option({"data": {name: value}}, name) == value
+
+
+@pytest.mark.parametrize("name,value", [
+    ("fetch_factor", 0),
+    ("fetch_factor", -1),
+    ("fetch_factor", 2.0),
+    ("fetch_factor", "2"),
+    ("fetch_factor", True),
+    ("profile_operators", 1),
+    ("profile_operators", "false"),
+])
+def test_get_data_option_invalid(name, value):
+    with pytest.raises(ValueError, match="data/%s" % name):
+        config_util.get_data_option({"data": {name: value}}, name)
+
+
+def test_merged_config():
+    a = {
+        "source": "en",
+        "preprocess": [{"op": "tokenization"}],
+        "data": {"sample": 10, "sample_dist": [{"path": "."}]},
+        "options": {"config": {"max_length": 100}, "model": "a"},
+    }
+    b = {
+        "data": {"sample": 20},
+        "options": {"config": {"beam_size": 5}},
+        "target": "de",
+    }
+    expected_a = copy.deepcopy(a)
+    merged = config_util.merged_config(a, b)
+    assert merged == {
+        "source": "en",
+        "target": "de",
+        "preprocess": [{"op": "tokenization"}],
+        "data": {"sample": 20, "sample_dist": [{"path": "."}]},
+        "options": {"config": {"max_length": 100, "beam_size": 5}, "model": "a"},
+    }
+    assert a == expected_a
+    # Values that are not updated are shared with a.
+    assert merged["preprocess"] is a["preprocess"]
+    assert merged["data"]["sample_dist"] is a["data"]["sample_dist"]
+    assert merged["data"] is not a["data"]
+    assert merged["options"]["config"] is not a["options"]["config"]
+
+
+def test_merged_config_replace_values():
+    a = {"preprocess": [{"op": "tokenization"}], "data": "path", "options": {"model": "a"}}
+    b = {"preprocess": [{"op": "noise"}], "data": {"sample": 20}, "options": None}
+    merged = config_util.merged_config(a, b)
+    assert merged == b
+    assert a == {"preprocess": [{"op": "tokenization"}], "data": "path", "options": {"model": "a"}}
+
+
+def test_merged_config_matches_merge_config():
+    a = {"x": {"y": {"z": 1, "w": 2}, "v": [1]}, "u": 0}
+    b = {"x": {"y": {"z": 3}, "t": {"s": 1}}, "u": {"k": 1}}
+    assert config_util.merged_config(a, b) == config_util.merge_config(copy.deepcopy(a), b)
@@ -0,0 +1,182 @@
+import copy
+import random
+
+import pytest
+
+from nmtwizard.preprocess import prepoperator
+from nmtwizard.preprocess.tu import TranslationUnit
+
+
+@pytest.fixture(autouse=True)
+def _clear_operator_params_cache():
+    prepoperator.clear_operator_params_cache()
+    yield
+    prepoperator.clear_operator_params_cache()
+
+
+def _get_config():
+    return {
+        "source": "en",
+        "target": "de",
+        "preprocess": [
+            {
+                "op": "length_filter",
+                "source": {"max_characters": 20, "min_words": None},
+                "target": {"max_characters": 20, "min_words": None},
+                "overrides": {"short": {"source": {"max_characters": 5}}},
+            },
+            {
+                "op": "tokenization",
+                "source": {"mode": "aggressive", "joiner_annotate": True},
+                "target": {"mode": "aggressive", "joiner_annotate": True},
+                "overrides": {"conservative": {"source": {"mode": "conservative"}}},
+            },
+        ],
+    }
+
+
+def test_operator_params_cache():
+    op_config = _get_config()["preprocess"][1]
+    params = prepoperator.get_operator_params(op_config, "tokenization")
+    assert params == {"source": op_config["source"], "target": op_config["target"]}
+    params["extra"] = True
+    other_params = prepoperator.get_operator_params(op_config, "tokenization")
+    assert other_params is not params
+    assert "extra" not in other_params
+    assert other_params["source"] is op_config["source"]
+
+
+def test_operator_params_override():
+    op_config = _get_config()["preprocess"][1]
+    params = prepoperator.get_operator_params(
+        op_config, "tokenization", override_label=["conservative"])
+    assert params["source"] == {"mode": "conservative", "joiner_annotate": True}
+    assert params["target"] is op_config["target"]
+    assert op_config["source"]["mode"] == "aggressive"
+    params = prepoperator.get_operator_params(
+        op_config, "tokenization", override_label=["unknown"])
+    assert params["source"] is op_config["source"]
+
+
+def test_operator_params_override_conflict():
+    op_config = _get_config()["preprocess"][1]
+    op_config["overrides"]["space"] = {"source": {"mode": "space"}}
+    with pytest.raises(RuntimeError):
+        prepoperator.get_operator_params(
+            op_config, "tokenization", override_label=["conservative", "space"])
+
+
+def test_operator_params_cache_clear():
+    op_config = _get_config()["preprocess"][1]
+    params = prepoperator.get_operator_params(op_config, "tokenization")
+    op_config["source"] = {"mode": "space"}
+    assert prepoperator.get_operator_params(op_config, "tokenization") == params
+    prepoperator.clear_operator_params_cache()
+    params = prepoperator.get_operator_params(op_config, "tokenization")
+    assert params["source"] == {"mode": "space"}
+
+
+def test_operator_params_cache_size(monkeypatch):
+    monkeypatch.setattr(prepoperator, "_OPERATOR_PARAMS_CACHE_SIZE", 2)
+    op_configs = _get_config()["preprocess"]
+    for op_config in op_configs:
+        prepoperator.get_operator_params(op_config, op_config["op"])
+    prepoperator.get_operator_params(op_configs[1], "tokenization", override_label=["conservative"])
+    assert len(prepoperator._operator_params_cache) == 2
+
+
+@pytest.mark.parametrize("override_label", [None, ["short"], ["conservative"]])
+def test_pipeline_does_not_modify_config(override_label):
+    config = _get_config()
+    expected_config = copy.deepcopy(config)
+    prepoperator.Pipeline(
+        config, prepoperator.ProcessType.TRAINING, override_label=override_label)
+    assert config == expected_config
+
+
+def _get_fusion_config():
+    return {
+        "source": "en",
+        "target": "de",
+        "preprocess": [
+            {
+                "op": "length_filter",
+                "source": {"max_characters": 30, "min_words": None},
+                "target": {"max_characters": 30, "min_words": None},
+            },
+            {"op": "identity_filter", "min_characters": 0},
+            {
+                "op": "tokenization",
+                "source": {"mode": "aggressive", "joiner_annotate": True},
+                "target": {"mode": "aggressive", "joiner_annotate": True},
+            },
+            {"op": "noise", "source": {"drop_word_prob": 0.3}},
+            {"op": "length_filter", "source": {"max_words": 10}},
+        ],
+    }
+
+
+def _get_tu_batch():
+    examples = [
+        ("Hello world!", "Hallo Welt!"),
+        ("The same sentence.", "The same sentence."),
+        ("This source sentence is too long to be kept.", "Kurz."),
+        ("A big-house, a small tree.", "Ein großes Haus."),
+        ("One two three four five.", "Eins zwei."),
+        ("Short.", "Kurz."),
+    ]
+    tu_list = [TranslationUnit(source=source, target=target) for source, target in examples]
+    return tu_list, {}
+
+
+def _run_pipeline(config, process_type):
+    pipeline = prepoperator.Pipeline(config, process_type)
+    random.seed(42)
+    tu_list, batch_meta = pipeline(_get_tu_batch())
+    outputs = pipeline.export_batch(tu_list)
+    return pipeline, outputs, batch_meta
+
+
+def test_operator_fusion(monkeypatch):
+    config = _get_fusion_config()
+    pipeline, outputs, batch_meta = _run_pipeline(config, prepoperator.ProcessType.TRAINING)
+    assert any(isinstance(op, prepoperator._FusedTUOperator) for op in pipeline._ops)
+
+    monkeypatch.setattr(
+        prepoperator, "_fuse_tu_operators", lambda ops, *args, **kwargs: ops)
+    ref_pipeline, ref_outputs, ref_batch_meta = _run_pipeline(
+        config, prepoperator.ProcessType.TRAINING)
+    assert not any(isinstance(op, prepoperator._FusedTUOperator) for op in ref_pipeline._ops)
+
+    assert len(outputs) > 0
+    assert outputs.src == ref_outputs.src
+    assert outputs.tgt == ref_outputs.tgt
+    assert outputs.metadata == ref_outputs.metadata
+    assert outputs.alignment == ref_outputs.alignment
+    assert batch_meta.get("filter_summary") == ref_batch_meta.get("filter_summary")
+    assert "stages_profile" not in batch_meta
+
+    # Fused operators report the time of each operator they apply.
+    ops_profile = batch_meta["ops_profile"]
+    assert set(ops_profile.keys()) == set(op.name for op in ref_pipeline._ops)
+    assert set(ref_batch_meta["ops_profile"].keys()) == set(ops_profile.keys())
+
+
+def test_operator_fusion_filter_summary():
+    config = _get_fusion_config()
+    _, _, batch_meta = _run_pipeline(config, prepoperator.ProcessType.TRAINING)
+    filter_summary = batch_meta["filter_summary"]
+    # Filters that did not remove any TU are also reported.
+    assert set(filter_summary.keys()) == {"length_filter_0", "identity_filter_1", "length_filter_4"}
+    assert filter_summary["length_filter_0"] == 1
+    assert filter_summary["identity_filter_1"] == 1
+    assert filter_summary["length_filter_4"] == 0
+
+
+def test_operator_fusion_profile_disabled():
+    config = _get_fusion_config()
+    config["data"] = {"profile_operators": False}
+    _, _, batch_meta = _run_pipeline(config, prepoperator.ProcessType.TRAINING)
+    assert "ops_profile" not in batch_meta
+    assert "stages_profile" not in batch_meta
+
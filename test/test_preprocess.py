@@ -0,0 +1,312 @@
+import collections
+import copy
+import itertools
+import multiprocessing
+import threading
+
+import pytest
+
+from nmtwizard.preprocess import prepoperator
+from nmtwizard.preprocess import preprocess
+from nmtwizard.preprocess.tu import TranslationUnit
+
+
+@pytest.mark.parametrize("nb_cpu,expected_num_cpus", [
+    ("1", 1),
+    ("4", 4),
+    ("-1", multiprocessing.cpu_count()),
+    ("-2", multiprocessing.cpu_count() - 1),
+    ("-1000", 1),
+])
+def test_get_num_workers(monkeypatch, nb_cpu, expected_num_cpus):
+    monkeypatch.setenv("NB_CPU", nb_cpu)
+    expected_num_workers = expected_num_cpus if expected_num_cpus > 1 else 0
+    assert preprocess._get_num_workers() == expected_num_workers
+
+
+def test_get_num_workers_default(monkeypatch):
+    monkeypatch.delenv("NB_CPU", raising=False)
+    assert preprocess._get_num_workers() == 0
+
+
+def _get_inference_config():
+    return {
+        "source": "en",
+        "target": "de",
+        "tokenization": {},
+        "preprocess": [
+            {
+                "op": "tokenization",
+                "source": {"mode": "aggressive", "joiner_annotate": True},
+                "target": {"mode": "aggressive", "joiner_annotate": True},
+            },
+        ],
+    }
+
+
+def _get_override_config(mode):
+    return {
+        "preprocess": [
+            {
+                "op": "tokenization",
+                "source": {"mode": mode},
+                "target": {"mode": mode},
+            },
+        ],
+    }
+
+
+def test_inference_override_pipeline_cache():
+    config = _get_inference_config()
+    expected_config = copy.deepcopy(config)
+    processor = preprocess.InferenceProcessor(config)
+
+    source, _, _ = processor.process_input("Hello world!", config=_get_override_config("space"))
+    assert source == [["Hello", "world!"]]
+    pipeline = processor._get_override_pipeline(_get_override_config("space"))
+    assert processor._get_override_pipeline(_get_override_config("space")) is pipeline
+    assert processor._get_override_pipeline(_get_override_config("conservative")) is not pipeline
+
+    # Overrides do not change the main pipeline nor the configuration.
+    source, _, _ = processor.process_input("Hello world!")
+    assert source == [["Hello", "world", "￭!"]]
+    assert config == expected_config
+
+
+def test_inference_override_pipeline_cache_size(monkeypatch):
+    monkeypatch.setattr(preprocess.InferenceProcessor, "override_pipelines_cache_size", 2)
+    processor = preprocess.InferenceProcessor(_get_inference_config())
+    space_pipeline = processor._get_override_pipeline(_get_override_config("space"))
+    processor._get_override_pipeline(_get_override_config("conservative"))
+    processor._get_override_pipeline(_get_override_config("aggressive"))
+    assert len(processor._override_pipelines) == 2
+    # The least recently used pipeline was removed.
+    assert processor._get_override_pipeline(_get_override_config("space")) is not space_pipeline
+
+
+def _get_batch_label(tu_batch):
+    label = tu_batch[0]
+    return label, "shared_state_%s" % label
+
+
+@pytest.mark.parametrize("labels,group_size,expected_groups", [
+    ([], 2, []),
+    (["a", "a", "a"], 1, [["a"], ["a"], ["a"]]),
+    (["a", "a", "a"], 2, [["a", "a"], ["a"]]),
+    (["a", "a", "b", "b", "b", "a"], 2, [["a", "a"], ["b", "b"], ["b"], ["a"]]),
+    (["a", None, None, "b"], 4, [["a"], [None, None], ["b"]]),
+])
+def test_group_batches(labels, group_size, expected_groups):
+    tu_batches = [(label, i) for i, label in enumerate(labels)]
+    groups = list(preprocess._group_batches(tu_batches, group_size, _get_batch_label))
+    assert [[label for label, _ in group] for _, _, group in groups] == expected_groups
+    # Batches are grouped in order.
+    assert [tu_batch for _, _, group in groups for tu_batch in group] == tu_batches
+    for override_label, shared_state, group in groups:
+        assert all(label == override_label for label, _ in group)
+        assert shared_state == "shared_state_%s" % override_label
+
+
+def test_get_pipeline_cache(monkeypatch):
+    monkeypatch.setattr(preprocess, "_MAX_CACHED_PIPELINES", 2)
+    config = _get_inference_config()
+    pipelines = collections.OrderedDict()
+
+    def _get_pipeline(override_label):
+        return preprocess._get_pipeline(
+            pipelines,
+            config,
+            prepoperator.ProcessType.TRAINING,
+            override_label=override_label,
+        )
+
+    default_pipeline = _get_pipeline(None)
+    assert default_pipeline.override_label is None
+    label_a_pipeline = _get_pipeline(frozenset(["a"]))
+    assert label_a_pipeline.override_label == frozenset(["a"])
+    assert _get_pipeline(None) is default_pipeline
+    assert _get_pipeline(frozenset(["a"])) is label_a_pipeline
+
+    # The least recently used pipeline is removed when the cache is full.
+    label_b_pipeline = _get_pipeline(frozenset(["b"]))
+    assert list(pipelines.values()) == [label_a_pipeline, label_b_pipeline]
+    assert _get_pipeline(frozenset(["a"])) is label_a_pipeline
+    assert _get_pipeline(None) is not default_pipeline
+    assert len(pipelines) == 2
+
+
+@pytest.mark.parametrize("max_size", [1, 3])
+def test_prefetch(max_size):
+    assert list(preprocess._prefetch(iter(range(10)), max_size)) == list(range(10))
+    assert list(preprocess._prefetch(iter([]), max_size)) == []
+
+
+def test_prefetch_error():
+    def _generate():
+        yield 0
+        yield 1
+        raise ValueError("invalid item")
+
+    items = []
+    with pytest.raises(ValueError, match="invalid item"):
+        for item in preprocess._prefetch(_generate(), 1):
+            items.append(item)
+    assert items == [0, 1]
+
+
+def test_prefetch_stop():
+    num_threads = threading.active_count()
+    items = preprocess._prefetch(itertools.count(), 2)
+    assert next(items) == 0
+    assert next(items) == 1
+    # The background thread is stopped when the iteration is interrupted.
+    items.close()
+    assert threading.active_count() == num_threads
+
+
+def test_process_loader_error():
+    config = _get_inference_config()
+    processor = preprocess.Processor(config, prepoperator.ProcessType.TRAINING, num_workers=0)
+
+    def _loader():
+        yield [TranslationUnit(source="Hello world!", target="Hallo Welt!")], {}
+        raise ValueError("invalid batch")
+
+    outputs = []
+    with pytest.raises(ValueError, match="invalid batch"):
+        processor.process(_loader, outputs.append)
+    assert len(outputs) == 1
+
+
+def _get_training_config(fetch_factor=1):
+    return {
+        "source": "en",
+        "target": "de",
+        "data": {"fetch_factor": fetch_factor, "profile_operators": False},
+        "preprocess": [
+            {
+                "op": "length_filter",
+                "source": {"max_characters": 20, "min_words": None},
+                "target": {"max_characters": 20, "min_words": None},
+                "overrides": {"short": {"source": {"max_characters": 10}}},
+            },
+            {
+                "op": "tokenization",
+                "source": {"mode": "aggressive", "joiner_annotate": True},
+                "target": {"mode": "aggressive", "joiner_annotate": True},
+                "overrides": {"space": {"source": {"mode": "space"}}},
+            },
+        ],
+    }
+
+
+def _get_training_loader(num_batches=12, batch_size=5):
+    labels = [None, "short", ["space"], ["short", "space"]]
+
+    def _loader():
+        for i in range(num_batches):
+            # Consecutive batches from the same corpus share the label object.
+            label = labels[(i // 3) % len(labels)]
+            tu_list = [
+                TranslationUnit(
+                    source="Batch %d, example %s!" % (i, "x" * j),
+                    target="Satz %d-%d" % (i, j),
+                )
+                for j in range(batch_size)
+            ]
+            yield tu_list, {"base_name": "corpus_%d" % i, "label": label}
+
+    return _loader
+
+
+def _process(config, loader, num_workers):
+    results = []
+
+    def _consumer(result):
+        outputs, batch_meta = result
+        results.append((outputs.src, outputs.tgt, batch_meta["base_name"],
+                        dict(batch_meta["filter_summary"])))
+
+    processor = preprocess.Processor(
+        config, prepoperator.ProcessType.TRAINING, num_workers=num_workers)
+    processor.process(loader, _consumer)
+    return results
+
+
+@pytest.mark.parametrize("fetch_factor", [1, 3])
+def test_process_parallel(fetch_factor):
+    config = _get_training_config(fetch_factor=fetch_factor)
+    loader = _get_training_loader()
+    expected_results = _process(config, loader, 0)
+    assert len(expected_results) == 12
+    # Results are consumed in the order of the batches.
+    assert _process(config, loader, 2) == expected_results
+
+
+def test_process_parallel_reuse_pool():
+    config = _get_training_config()
+    loader = _get_training_loader()
+    processor = preprocess.Processor(
+        config, prepoperator.ProcessType.TRAINING, num_workers=2)
+
+    results = []
+
+    def _consumer(result):
+        outputs, _ = result
+        results.append(outputs.src)
+
+    with processor:
+        processor.process(loader, _consumer)
+        first_results = results
+        results = []
+        # Stages can update the configuration in place.
+        config["preprocess"][1]["source"]["mode"] = "space"
+        processor.process(loader, _consumer)
+
+    assert first_results == [src for src, _, _, _ in _process(_get_training_config(), loader, 0)]
+    assert results == [src for src, _, _, _ in _process(config, loader, 0)]
+    assert results != first_results
+
+
+def test_process_parallel_worker_error():
+    config = _get_training_config()
+    # The target length ratio can not be computed for empty targets.
+    config["preprocess"][0]["max_words_ratio"] = 2
+
+    def _loader():
+        for i in range(6):
+            yield [TranslationUnit(source="a b", target="")], {"base_name": "corpus_%d" % i}
+
+    with pytest.raises(RuntimeError, match="when processing file 'corpus_0' in worker process"):
+        _process(config, _loader, 2)
+
+
+def test_process_parallel_loader_error():
+    def _loader():
+        yield from _get_training_loader(num_batches=4)()
+        raise ValueError("invalid batch")
+
+    with pytest.raises(ValueError, match="invalid batch"):
+        _process(_get_training_config(), _loader, 2)
+
+
+def test_process_parallel_consumer_error():
+    processor = preprocess.Processor(
+        _get_training_config(), prepoperator.ProcessType.TRAINING, num_workers=2)
+    num_calls = 0
+
+    def _consumer(result):
+        nonlocal num_calls
+        num_calls += 1
+        if num_calls == 3:
+            raise KeyError("invalid result")
+
+    with pytest.raises(KeyError, match="invalid result"):
+        processor.process(_get_training_loader(), _consumer)
+    assert num_calls == 3
+
+
+def test_process_parallel_invalid_fetch_factor():
+    config = _get_training_config(fetch_factor=0)
+    with pytest.raises(ValueError, match="data/fetch_factor"):
+        _process(config, _get_training_loader(), 2)
@@ -0,0 +1,51 @@
+import pickle
+
+from nmtwizard.preprocess import tu
+
+
+def _get_fields():
+    return [
+        ([["Hello", "world", "￭!"]], [["Hallo", "Welt", "￭!"]], [None], None),
+        ([["Bye"]], None, [{"id": 1}], [set([(0, 0)])]),
+    ]
+
+
+def test_preprocess_outputs():
+    fields = _get_fields()
+    outputs = tu.PreprocessOutputs.from_fields(fields)
+    assert len(outputs) == 2
+    assert outputs.src == [fields[0][0], fields[1][0]]
+    assert outputs.tgt == [fields[0][1], fields[1][1]]
+    assert outputs.metadata == [fields[0][2], fields[1][2]]
+    assert outputs.alignment == [fields[0][3], fields[1][3]]
+
+    for i, output in enumerate(outputs):
+        assert isinstance(output, tu.PreprocessOutput)
+        src, tgt, metadata, alignment = fields[i]
+        assert output.src == src
+        assert output.tgt == tgt
+        assert output.metadata == metadata
+        assert output.alignment == alignment
+        assert outputs[i].src == src
+    assert outputs[-1].metadata == fields[-1][2]
+
+
+def test_preprocess_outputs_empty():
+    outputs = tu.PreprocessOutputs.from_fields([])
+    assert len(outputs) == 0
+    assert list(outputs) == []
+    assert outputs.src == []
+
+
+def test_preprocess_outputs_pickle():
+    outputs = tu.PreprocessOutputs.from_fields(_get_fields())
+    outputs = pickle.loads(pickle.dumps(outputs))
+    assert len(outputs) == 2
+    assert outputs[1].alignment == _get_fields()[1][3]
+
+
+def test_export_fields():
+    translation_unit = tu.TranslationUnit(source="Hello world!", target="Hallo Welt!")
+    outputs = tu.PreprocessOutputs.from_fields([translation_unit.export_fields()])
+    assert outputs[0].src == "Hello world!"
+    assert outputs[0].tgt == "Hallo Welt!"